@@ -1,13 +1,295 @@
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 from scipy.integrate import odeint
-from scipy.optimize import minimize
+from scipy.optimize import minimize, differential_evolution
 import math
-from scipy.stats import binom as binom
+import hashlib
+from scipy.special import gammaln
+from numba import njit
 
 from smoothing import dataframe_smoothing
 
+
+def source_hash():
+    """
+    Hash of this file, stored in seir_fast by build_seir.py to detect an outdated build
+    :return: a positive integer of 60 bits
+    """
+    with open(__file__, 'rb') as f:
+        return int(hashlib.sha256(f.read()).hexdigest()[:15], 16)
+
+
+# Ahead of time compiled integrators and objective, built by build_seir.py.
+# Without it, or if SEIR.py changed since the build, the numba JIT versions defined below are used.
+try:
+    import seir_fast
+    if seir_fast.source_hash() != source_hash():
+        seir_fast = None
+except ImportError:
+    seir_fast = None
+
+# Log of the smallest normal float: below it binom.pmf returns a subnormal value,
+# rounded to a multiple of the smallest positive float, or 0
+LOG_MIN_NORMAL = np.log(np.finfo(np.float64).tiny)
+
+
+@njit(cache=True, fastmath=True)
+def _seir_rhs(state, time, beta, sigma, gamma, hp, hcr, pc, pd, pcr, inv_N):
+    """
+    ODE who describe the evolution of the model with the time.
+    Compiled with numba since odeint call it at each integration step
+    :param state: An initial state to use
+    :param time: A time vector
+    :param inv_N: Inverse of the population size S + E + I + R + H + C + D, which the model conserves
+    :return: the evolution of the number of person in each compartiment + cumulative testing rate
+    + cumulative entry in hospital
+    """
+    S, E, I, R, H, C, D, CT, CH = state
+
+    dS = -(beta * S * I) * inv_N
+    dE = ((beta * S * I) * inv_N) - (sigma * E)
+    dI = (sigma * E) - (gamma * I) - (hp * I)
+    dH = (hp * I) - (hcr * H) - (pc * H)
+    dC = (pc * H) - (pd * C) - (pcr * C)
+    dD = (pd * C)
+    dR = (gamma * I) + (hcr * H) + (pcr * C)
+
+    dCT = sigma * E
+    dCH = hp * I
+
+    return dS, dE, dI, dR, dH, dC, dD, dCT, dCH
+
+
+@njit(cache=True, fastmath=True)
+def _seir_jac(state, time, beta, sigma, gamma, hp, hcr, pc, pd, pcr, inv_N):
+    """
+    Jacobian of _seir_rhs, used by odeint (LSODA) instead of a finite difference estimation
+    :return: a 9 x 9 array where jac[i, j] = d(d state_i)/d state_j
+    """
+    S, E, I, R, H, C, D, CT, CH = state
+
+    # Derivative of the infection term beta * S * I / N:
+    d_inf_S = beta * I * inv_N
+    d_inf_I = beta * S * inv_N
+
+    jac = np.zeros((9, 9))
+    # dS
+    jac[0, 0] = - d_inf_S
+    jac[0, 2] = - d_inf_I
+    # dE
+    jac[1, 0] = d_inf_S
+    jac[1, 2] = d_inf_I
+    jac[1, 1] = - sigma
+    # dI
+    jac[2, 1] = sigma
+    jac[2, 2] = - gamma - hp
+    # dR
+    jac[3, 2] = gamma
+    jac[3, 4] = hcr
+    jac[3, 5] = pcr
+    # dH
+    jac[4, 2] = hp
+    jac[4, 4] = - hcr - pc
+    # dC
+    jac[5, 4] = pc
+    jac[5, 5] = - pd - pcr
+    # dD
+    jac[6, 5] = pd
+    # dCT
+    jac[7, 1] = sigma
+    # dCH
+    jac[8, 2] = hp
+
+    return jac
+
+
+@njit(cache=True)
+def _rk4_step(y, h, k1, k2, k3, k4):
+    """
+    Combine the four RK4 slopes to move the state forward of one step
+    """
+    c = h / 6.0
+    return (y[0] + c * (k1[0] + 2.0 * k2[0] + 2.0 * k3[0] + k4[0]),
+            y[1] + c * (k1[1] + 2.0 * k2[1] + 2.0 * k3[1] + k4[1]),
+            y[2] + c * (k1[2] + 2.0 * k2[2] + 2.0 * k3[2] + k4[2]),
+            y[3] + c * (k1[3] + 2.0 * k2[3] + 2.0 * k3[3] + k4[3]),
+            y[4] + c * (k1[4] + 2.0 * k2[4] + 2.0 * k3[4] + k4[4]),
+            y[5] + c * (k1[5] + 2.0 * k2[5] + 2.0 * k3[5] + k4[5]),
+            y[6] + c * (k1[6] + 2.0 * k2[6] + 2.0 * k3[6] + k4[6]),
+            y[7] + c * (k1[7] + 2.0 * k2[7] + 2.0 * k3[7] + k4[7]),
+            y[8] + c * (k1[8] + 2.0 * k2[8] + 2.0 * k3[8] + k4[8]))
+
+
+@njit(cache=True)
+def _euler_step(y, h, k):
+    """
+    Intermediate state y + h * k used by the RK4 stages
+    """
+    return (y[0] + h * k[0], y[1] + h * k[1], y[2] + h * k[2],
+            y[3] + h * k[3], y[4] + h * k[4], y[5] + h * k[5],
+            y[6] + h * k[6], y[7] + h * k[7], y[8] + h * k[8])
+
+
+@njit(cache=True)
+def integrate_seir(y0, n_steps, dt, prm, n_sub):
+    """
+    Fixed step Runge-Kutta 4 integration of the model
+    :param y0: Tuple of the 9 initial values (floats)
+    :param n_steps: Number of rows to compute, the first one is y0
+    :param dt: Time between two rows
+    :param prm: Tuple of the 8 epidemic parameters
+    :param n_sub: Number of RK4 steps between two rows
+    :return: a numpy array of 9 columns and n_steps rows
+    """
+    beta, sigma, gamma, hp, hcr, pc, pd, pcr = prm
+    # The population size is constant, computed once from the initial state
+    inv_N = 1.0 / (y0[0] + y0[1] + y0[2] + y0[3] + y0[4] + y0[5] + y0[6])
+    h = dt / n_sub
+    out = np.empty((n_steps, 9))
+    y = y0
+    for i in range(n_steps):
+        for j in range(9):
+            out[i, j] = y[j]
+        for _ in range(n_sub):
+            k1 = _seir_rhs(y, 0.0, beta, sigma, gamma, hp, hcr, pc, pd, pcr, inv_N)
+            k2 = _seir_rhs(_euler_step(y, 0.5 * h, k1), 0.0, beta, sigma, gamma, hp, hcr, pc, pd, pcr, inv_N)
+            k3 = _seir_rhs(_euler_step(y, 0.5 * h, k2), 0.0, beta, sigma, gamma, hp, hcr, pc, pd, pcr, inv_N)
+            k4 = _seir_rhs(_euler_step(y, h, k3), 0.0, beta, sigma, gamma, hp, hcr, pc, pd, pcr, inv_N)
+            y = _rk4_step(y, h, k1, k2, k3, k4)
+    return out
+
+
+@njit(cache=True)
+def integrate_seir_batch(y0, n_steps, dt, prm, n_sub):
+    """
+    Integrate the model for B sets of parameters at once, see integrate_seir
+    :param y0: Array of B rows and 9 columns of initial values
+    :param n_steps: Number of time steps to compute
+    :param dt: Time between two time steps
+    :param prm: Array of B rows and 8 columns of epidemic parameters
+    :param n_sub: Number of RK4 steps between two time steps
+    :return: a numpy array of shape (n_steps, B, 9)
+    """
+    out = np.empty((n_steps, prm.shape[0], 9))
+    for b in range(prm.shape[0]):
+        init = (y0[b, 0], y0[b, 1], y0[b, 2], y0[b, 3], y0[b, 4], y0[b, 5], y0[b, 6], y0[b, 7], y0[b, 8])
+        params = (prm[b, 0], prm[b, 1], prm[b, 2], prm[b, 3], prm[b, 4], prm[b, 5], prm[b, 6], prm[b, 7])
+        out[:, b, :] = integrate_seir(init, n_steps, dt, params, n_sub)
+    return out
+
+
+@njit(cache=True)
+def _binom_loglike(k, lgk, n, b_s, p, overflow):
+    """
+    Log probability of one observed value according to one rounded prediction.
+    This is the only implementation of the probability rules, used by objective() and score()
+    :param k: Observed value
+    :param lgk: gammaln(k + 1) of the observed value
+    :param n: Rounded predicted value
+    :param b_s: Binomial smoother to apply on n
+    :param p: Probability of the binomial law
+    :param overflow: Value to return if the probability is null
+    """
+    if math.isnan(k) or math.isnan(n):
+        return overflow
+    k_obs = k
+    # Branchless version of: negate both if both are negatives, swap to get k <= n,
+    # then if k < 0: n += - k + 1 and k = 1
+    sign = 1.0 - 2.0 * ((k < 0) & (n < 0))
+    lo = min(k * sign, n * sign)
+    hi = max(k * sign, n * sign)
+    shift = (lo < 0) * (1.0 - lo)
+    k = lo + shift
+    n = (hi + shift) * b_s
+    # Out of the support of the law:
+    if not (k >= 0 and k <= n and k == math.floor(k) and n == math.floor(n)):
+        return overflow
+    if k != k_obs:
+        lgk = math.lgamma(k + 1)
+    lp = math.lgamma(n + 1) - lgk - math.lgamma(n - k + 1)
+    if k > 0:
+        lp += k * math.log(p)
+    if n > k:
+        lp += (n - k) * math.log1p(-p)
+    # Same values as the former log(binom.pmf(k, n, p)) if binom.pmf(k, n, p) > 0
+    if lp < LOG_MIN_NORMAL:
+        pmf = math.exp(lp)
+        if pmf == 0:
+            return overflow
+        return math.log(pmf)
+    return lp
+
+
+@njit(cache=True)
+def _loglike_curve(k, lgk, n, b_s, p, overflow):
+    """
+    Log probability of each value of one observed curve
+    :param k: Array of T observed values
+    :param lgk: gammaln(k + 1) of the observed values
+    :param n: Array of T rounded predicted values
+    :param b_s: Binomial smoother to apply on n
+    :param p: Probability of the binomial law
+    :param overflow: Value to use if a probability is null
+    :return: an array of T log probabilities
+    """
+    out = np.empty(n.shape[0])
+    for i in range(n.shape[0]):
+        out[i] = _binom_loglike(k[i], lgk[i], n[i], b_s, p, overflow)
+    return out
+
+
+@njit(cache=True)
+def _loglike_all(n, k, lgk, b_s, p, weights, overflow):
+    """
+    Weighted sum of the log probabilities of the observed curves
+    :param n: Tuple of the rounded predicted curves, arrays of T rows and S columns
+    :param k: Tuple of the observed curves, arrays of T values
+    :param lgk: Tuple of gammaln(k + 1) of the observed curves
+    :param b_s: Binomial smoother of each curve
+    :param p: Probability of the binomial law of each curve
+    :param weights: Weight of each curve
+    :param overflow: Value to use if a probability is null
+    :return: an array of S sums
+    """
+    prb = np.zeros(n[0].shape[1])
+    for j in range(len(n)):
+        for i in range(n[j].shape[0]):
+            for c in range(n[j].shape[1]):
+                prb[c] += weights[j] * _binom_loglike(k[j][i], lgk[j][i], n[j][i, c], b_s[j], p[j], overflow)
+    return prb
+
+
+@njit(cache=True)
+def objective_jit(y0, n_steps, prm, n_sub, scale_1, k, lgk, b_s, p, weights, overflow):
+    """
+    Objective function for one set of parameters without leaving compiled code:
+    RK4 integration, uncumul of the positive tests and weighted log probabilities
+    :param y0: Tuple of the 9 initial values
+    :param n_steps: Number of days of the dataset
+    :param prm: Tuple of the 8 epidemic parameters
+    :param n_sub: Number of RK4 steps per day
+    :param scale_1: Factor applied on the daily positive tests before rounding
+    :param k: Tuple of the 5 observed curves
+    :param lgk: Tuple of gammaln(k + 1) of the observed curves
+    :param b_s: Binomial smoother of each curve
+    :param p: Probability of the binomial law of each curve
+    :param weights: Weight of each curve
+    :param overflow: Value to use if a probability is null
+    :return: Minus the weighted sum of the log probabilities
+    """
+    pred = integrate_seir(y0, n_steps, 1.0, prm, n_sub)
+    prb = 0.0
+    prev_CT = 0.0
+    for i in range(n_steps):
+        conta = pred[i, 7] - prev_CT
+        prev_CT = pred[i, 7]
+        n = (np.rint(conta * scale_1), np.rint(pred[i, 4]), np.rint(pred[i, 8]),
+             np.rint(pred[i, 5]), np.rint(pred[i, 6]))
+        for j in range(5):
+            prb += weights[j] * _binom_loglike(k[j][i], lgk[j][i], n[j], b_s[j], p[j], overflow)
+    return - prb
+
+
 class SEIR():
 
     def __init__(self):
@@ -27,6 +309,18 @@ class SEIR():
         # Learning set
         self.dataframe = None
         self.dataset = None
+        self.ds_pos = None          # Positive tests
+        self.ds_hosp = None         # Hospitalized
+        self.ds_cum_hosp = None     # Cumulative hospitalizations
+        self.ds_crit = None         # Critical
+        self.ds_death = None        # Fatalities
+        self.ds_cum_pos = None      # Cumulative positive tests
+        self.gammaln_k = None
+        # Same 5 curves as in objective() and their gammaln_k, one row per curve (for seir_fast)
+        self.ds_obs = None
+        self.gammaln_obs = None
+        # Last initial state computed: ((sensitivity, testing rate), state)
+        self.init_cache = None
 
         # Initial state
         self.I_0 = 2                        # Infected
@@ -68,6 +362,9 @@ class SEIR():
         # Optimizer step size
         self.opti_step = 0.1
 
+        # Number of processes for the L-BFGS-B gradient (-1 = all cores, scipy >= 1.16)
+        self.opti_workers = 1
+
         # Optimizer constraints
         self.beta_min = 0.1
         self.beta_max = 0.9
@@ -90,12 +387,24 @@ class SEIR():
         self.t_min = 0.5
         self.t_max = 1
 
-        # Optimizer choise: COBYLA LBFGSB ou AUTO
+        # Optimizer choise: COBYLA COBYQA LBFGSB DE ou Auto
         self.optimizer = 'COBYLA'
 
+        # Print the objective value every print_every callback calls if fit(display=True).
+        # Depending on the optimizer, the callback is called after each iteration (COBYLA, LBFGSB, DE)
+        # or after each evaluation of the objective (COBYQA)
+        self.print_every = 10
+        self.fit_calls = 0
+
         # Fit type:
         self.fit_type = 'type_1'
 
+        # Integrator choice: RK4 or LSODA (scipy's odeint)
+        self.integrator = 'RK4'
+
+        # Number of RK4 steps per day
+        self.rk4_sub_steps = 4
+
     def get_parameters(self):
 
         prm = (self.beta, self.sigma, self.gamma, self.hp, self.hcr, self.pc, self.pd, self.pcr)
@@ -113,7 +422,7 @@ class SEIR():
         estimate the true value of the initial state
         :param sensib: Sensibility value to use. Use class value if None
         :param test_rate: Testing rate value to use. Use class value if None
-        :return: An array
+        :return: A tuple of 9 values (of arrays if sensib or test_rate are arrays)
         """
         if sensib is None:
             s = self.s
@@ -124,8 +433,13 @@ class SEIR():
         else:
             t = test_rate
 
-        I_0 = np.round(np.round(self.dataset[0][1] / (s * t)))
-        H_0 = self.dataset[0][3]
+        # Same sensitivity and testing rate as the previous call:
+        scalar = np.ndim(s) == 0 and np.ndim(t) == 0
+        if scalar and self.init_cache is not None and self.init_cache[0] == (s, t):
+            return self.init_cache[1]
+
+        I_0 = np.round(np.round(self.ds_pos[0] / (s * t)))
+        H_0 = self.ds_hosp[0]
         E_0 = I_0
         D_0 = 0
         C_0 = 0
@@ -134,39 +448,20 @@ class SEIR():
         CT_0 = I_0
         CH_0 = H_0
         init = (S_0, E_0, I_0, R_0, H_0, C_0, D_0, CT_0, CH_0)
+        if scalar:
+            init = tuple(float(x) for x in init)
+            self.init_cache = ((s, t), init)
         return init
 
-    def differential(self, state, time, beta, sigma, gamma, hp, hcr, pc, pd, pcr):
-        """
-        ODE who describe the evolution of the model with the time
-        :param state: An initial state to use
-        :param time: A time vector
-        :return: the evolution of the number of person in each compartiment + cumulative testing rate
-        + cumulative entry in hospital
-        """
-        S, E, I, R, H, C, D, CT, CH = state
-
-        dS = -(beta * S * I) / (S + I + E + R + H + C + D)
-        dE = ((beta * S * I) / (S + I + E + R + H + C + D)) - (sigma * E)
-        dI = (sigma * E) - (gamma * I) - (hp * I)
-        dH = (hp * I) - (hcr * H) - (pc * H)
-        dC = (pc * H) - (pd * C) - (pcr * C)
-        dD = (pd * C)
-        dR = (gamma * I) + (hcr * H) + (pcr * C)
-
-        dCT = sigma * E
-        dCH = hp * I
-
-        return dS, dE, dI, dR, dH, dC, dD, dCT, dCH
-
     def predict(self, duration, initial_state=None, parameters=None):
         """
         Predict the evolution of the epidemic during the selected duration from a given initial state
         and given parameters
         :param duration: Use positive integer value
         :param initial_state: Default = use self.get_initial_state()
-        :param parameters: Default = use self.get_parameters()
-        :return: a numpy array of 8 columns and t rows
+        :param parameters: Default = use self.get_parameters(). An array of B rows of parameters
+        can be used to make B predictions at once
+        :return: a numpy array of 8 columns and t rows, or of shape (t, B, 9) for B sets of parameters
         """
         # Time vector:
         time = np.arange(duration)
@@ -179,11 +474,39 @@ class SEIR():
         if init is None:
             init = self.get_initial_state()
 
+        # Several sets of parameters:
+        if np.ndim(prm) == 2:
+            prm = np.ascontiguousarray(prm, dtype=np.float64)
+            init = np.ascontiguousarray(np.broadcast_to(np.asarray(init, dtype=np.float64), (prm.shape[0], 9)))
+            if self.integrator == 'LSODA':
+                return np.stack([odeint(func=_seir_rhs, y0=init[b], t=time,
+                                        args=(*prm[b], 1.0 / np.sum(init[b, :7])),
+                                        Dfun=_seir_jac, col_deriv=False)
+                                 for b in range(prm.shape[0])], axis=1)
+            if seir_fast is not None:
+                return seir_fast.integrate_batch(init, duration, 1.0, prm, self.rk4_sub_steps)
+            return integrate_seir_batch(init, duration, 1.0, prm, self.rk4_sub_steps)
+
         # Make prediction:
-        predict = odeint(func=self.differential,
-                         y0=init,
-                         t=time,
-                         args=(tuple(prm)))
+        if self.integrator == 'LSODA':
+            predict = odeint(func=_seir_rhs,
+                             y0=init,
+                             t=time,
+                             args=(*prm, 1.0 / np.sum(init[:7])),
+                             Dfun=_seir_jac,
+                             col_deriv=False)
+        elif seir_fast is not None:
+            predict = seir_fast.integrate(np.asarray(init, dtype=np.float64),
+                                          duration,
+                                          1.0,
+                                          np.asarray(prm, dtype=np.float64),
+                                          self.rk4_sub_steps)
+        else:
+            predict = integrate_seir(tuple(np.asarray(init, dtype=np.float64)),
+                                     duration,
+                                     1.0,
+                                     tuple(np.asarray(prm, dtype=np.float64)),
+                                     self.rk4_sub_steps)
         return predict
 
     def fit(self, display=False, step_2=False):
@@ -194,51 +517,13 @@ class SEIR():
         if self.fit_type == 'type_1' and not step_2:
             # Initial values of parameters:
             init_prm = (self.beta, self.sigma, self.gamma, self.hp, self.hcr, self.pc, self.pd, self.pcr)
-            # Time vector:
-            time = self.dataset[:, 0]
             # Bounds
             bds = [(self.beta_min, self.beta_max), (self.sigma_min, self.sigma_max), (self.gamma_min, self.gamma_max),
                    (self.hp_min, self.hp_max), (self.hcr_min, self.hcr_max), (self.pc_min, self.pc_max),
                    (self.pd_min, self.pd_max), (self.pcr_min, self.pcr_max)]
-            # Constraint on parameters:
-            cons = ({'type': 'ineq', 'fun': lambda x: -x[0] + self.beta_max},
-                    {'type': 'ineq', 'fun': lambda x: -x[1] + self.sigma_max},
-                    {'type': 'ineq', 'fun': lambda x: -x[2] + self.gamma_max},
-                    {'type': 'ineq', 'fun': lambda x: -x[3] + self.hp_max},
-                    {'type': 'ineq', 'fun': lambda x: -x[4] + self.hcr_max},
-                    {'type': 'ineq', 'fun': lambda x: -x[5] + self.pc_max},
-                    {'type': 'ineq', 'fun': lambda x: -x[6] + self.pd_max},
-                    {'type': 'ineq', 'fun': lambda x: -x[7] + self.pcr_max},
-                    {'type': 'ineq', 'fun': lambda x: x[0] - self.beta_min},
-                    {'type': 'ineq', 'fun': lambda x: x[1] - self.sigma_min},
-                    {'type': 'ineq', 'fun': lambda x: x[2] - self.gamma_min},
-                    {'type': 'ineq', 'fun': lambda x: x[3] - self.hp_min},
-                    {'type': 'ineq', 'fun': lambda x: x[4] - self.hcr_min},
-                    {'type': 'ineq', 'fun': lambda x: x[5] - self.pc_min},
-                    {'type': 'ineq', 'fun': lambda x: x[6] - self.pd_min},
-                    {'type': 'ineq', 'fun': lambda x: x[7] - self.pcr_min})
 
             # Optimizer
-            res = None
-            if self.optimizer == 'LBFGSB':
-                res = minimize(self.objective, np.asarray(init_prm),
-                               method='L-BFGS-B',
-                               options={'eps': self.opti_step},
-                               constraints=cons,
-                               bounds=bds,
-                               args=('method_1', False, display))
-            else:
-                if self.optimizer == 'COBYLA':
-                    res = minimize(self.objective, np.asarray(init_prm),
-                                   method='COBYLA',
-                                   args=('method_1', False, display),
-                                   constraints=cons)
-                else:   # Auto
-                    res = minimize(self.objective, np.asarray(init_prm),
-                                   constraints=cons,
-                                   options={'eps': self.opti_step},
-                                   args=('method_1, False, display'))
-
+            res = self.run_optimizer(init_prm, bds, 'method_1', display=display)
 
             if display:
                 # Print optimizer result
@@ -257,46 +542,13 @@ class SEIR():
         if step_2:
             # Initial values of parameters:
             init_prm = (self.beta, self.sigma, self.gamma, self.hp, self.s, self.t)
-            # Time vector:
-            time = self.dataset[:, 0]
             # Bounds
             bds = [(self.beta_min, self.beta_max), (self.sigma_min, self.sigma_max),
                    (self.gamma_min, self.gamma_max),
                    (self.hp_min, self.hp_max), (self.s_min, self.s_max), (self.t_min, self.t_max)]
-            # Constraint on parameters:
-            cons = ({'type': 'ineq', 'fun': lambda x: -x[0] + self.beta_max},
-                    {'type': 'ineq', 'fun': lambda x: -x[1] + self.sigma_max},
-                    {'type': 'ineq', 'fun': lambda x: -x[2] + self.gamma_max},
-                    {'type': 'ineq', 'fun': lambda x: -x[3] + self.hp_max},
-                    {'type': 'ineq', 'fun': lambda x: -x[4] + self.s_max},
-                    {'type': 'ineq', 'fun': lambda x: -x[5] + self.t_max},
-                    {'type': 'ineq', 'fun': lambda x: x[0] - self.beta_min},
-                    {'type': 'ineq', 'fun': lambda x: x[1] - self.sigma_min},
-                    {'type': 'ineq', 'fun': lambda x: x[2] - self.gamma_min},
-                    {'type': 'ineq', 'fun': lambda x: x[3] - self.hp_min},
-                    {'type': 'ineq', 'fun': lambda x: x[4] - self.s_min},
-                    {'type': 'ineq', 'fun': lambda x: x[5] - self.s_min})
 
             # Optimizer
-            res = None
-            if self.optimizer == 'LBFGSB':
-                res = minimize(self.objective, np.asarray(init_prm),
-                               method='L-BFGS-B',
-                               options={'eps': self.opti_step},
-                               constraints=cons,
-                               bounds=bds,
-                               args=('method_2', False, display))
-            else:
-                if self.optimizer == 'COBYLA':
-                    res = minimize(self.objective, np.asarray(init_prm),
-                                   method='COBYLA',
-                                   args=('method_2', False, display),
-                                   constraints=cons)
-                else:  # Auto
-                    res = minimize(self.objective, np.asarray(init_prm),
-                                   constraints=cons,
-                                   options={'eps': self.opti_step},
-                                   args=('method_2', False, display))
+            res = self.run_optimizer(init_prm, bds, 'method_2', display=display)
 
             if display:
                 # Print optimizer result
@@ -310,6 +562,61 @@ class SEIR():
             self.s = res.x[4]
             self.t = res.x[5]
 
+    def run_optimizer(self, init_prm, bds, method, display=False):
+        """
+        Minimize the objective function with the selected optimizer.
+        The bounds are directly handled by the optimizer.
+        :param init_prm: Initial values of the parameters to fit
+        :param bds: List of (min, max) for each parameter
+        :param method: 'method_1' or 'method_2', see objective()
+        :param display: Print the objective value every print_every callback calls
+        :return: The optimizer result
+        """
+        callback = None
+        if display:
+            self.fit_calls = 0
+            callback = self.fit_callback
+        if self.optimizer == 'LBFGSB':
+            # Forward difference gradient of step opti_step, spread over opti_workers processes
+            options = {'eps': self.opti_step}
+            if self.opti_workers != 1:
+                options['workers'] = self.opti_workers
+            return minimize(self.objective, np.asarray(init_prm),
+                            method='L-BFGS-B',
+                            options=options,
+                            bounds=bds,
+                            args=(method, False),
+                            callback=callback)
+        if self.optimizer == 'COBYLA':
+            return minimize(self.objective, np.asarray(init_prm),
+                            method='COBYLA',
+                            bounds=bds,
+                            args=(method, False),
+                            callback=callback)
+        if self.optimizer == 'COBYQA':
+            # Derivative free trust region method (scipy >= 1.14)
+            return minimize(self.objective, np.asarray(init_prm),
+                            method='COBYQA',
+                            bounds=bds,
+                            args=(method, False),
+                            callback=callback)
+        if self.optimizer == 'DE':
+            # The whole population is evaluated by a single objective call
+            return differential_evolution(self.objective, bds,
+                                          args=(method, False),
+                                          x0=np.asarray(init_prm),
+                                          vectorized=True,
+                                          updating='deferred',
+                                          callback=callback)
+        if self.optimizer in ('Auto', 'AUTO'):
+            # Let scipy choose the method
+            return minimize(self.objective, np.asarray(init_prm),
+                            bounds=bds,
+                            options={'eps': self.opti_step},
+                            args=(method, False),
+                            callback=callback)
+        raise ValueError("Unknown optimizer '{}', use 'COBYLA', 'COBYQA', 'LBFGSB', 'DE' or 'Auto'".format(self.optimizer))
+
 
 
     def fit_rates(self):
@@ -317,12 +624,9 @@ class SEIR():
         # Valeurs de départ:
         init_prm = [self.t * self.s]
 
-        cons = ({'type': 'ineq', 'fun': lambda x: -x[0] + 0.85},
-                {'type': 'ineq', 'fun': lambda x: x[0] - 0.3})
-
         res = minimize(self.fit_rate_objectif, np.asarray(init_prm),
                        method='COBYLA',
-                       constraints=cons)
+                       bounds=[(0.3, 0.85)])
         print('=========================================')
         print('Fit rate result:')
         print(res)
@@ -346,319 +650,133 @@ class SEIR():
 
 
 
-    def objective(self, parameters, method, print_details=False, display=False):
+    def log_likelihood(self, k, n, b_s, p=None, lgk=None):
+        """
+        Compute the log probability of each observed value according to the predictions.
+        The whole time serie is processed at once by the compiled _binom_loglike, like in objective().
+        :param k: Array of observed values
+        :param n: Array of rounded predicted values
+        :param b_s: Binomial smoother to apply on n
+        :param p: Probability of the binomial law. Default = 1 / b_s
+        :param lgk: Precomputed gammaln(k + 1) of the observed values (see import_dataset)
+        :return: An array of log probabilities where null probabilities are replaced by self.overflow
+        """
+        if p is None:
+            p = 1 / b_s
+        k = np.ascontiguousarray(k, dtype=np.float64)
+        if lgk is None:
+            lgk = gammaln(k + 1)
+        n = np.ascontiguousarray(n, dtype=np.float64)
+        return _loglike_curve(k, np.ascontiguousarray(lgk, dtype=np.float64), n,
+                              float(b_s), float(p), float(self.overflow))
+
+    def fit_callback(self, intermediate_result):
+        """
+        Called by the optimizer when fit() is used with display=True,
+        after each iteration or each objective evaluation depending on the optimizer
+        :param intermediate_result: scipy OptimizeResult with the current parameters and objective value
+        """
+        self.fit_calls += 1
+        if self.fit_calls % self.print_every == 0:
+            print('callback call {}: {} - {}'.format(self.fit_calls, intermediate_result.fun, intermediate_result.x))
+
+    def objective(self, parameters, method, print_details=False):
         """
         The objective function to minimize during the fitting process.
         These function compute the probability of each observed values accroding to predictions
         take the logarighm value and make the sum.
+        If parameters is an array of shape (N, S), the S columns are evaluated at once
+        and an array of S values is returned (scipy's vectorized convention).
         """
+        batch = np.ndim(parameters) == 2
 
         if method == 'method_1':
-            # Make predictions:
-            params = tuple(parameters)
+            params = parameters
             init_state = self.get_initial_state()
-            if display:
-                print(params)
-            pred = self.predict(duration=self.dataset.shape[0],
-                                parameters=params,
-                                initial_state=init_state)
-            # Uncumul positive test:
-            uncumul = []
-            uncumul.append(pred[0][7])
-            for i in range(1, pred.shape[0]):
-                uncumul.append(pred[i][7] - pred[i-1][7])
-            # Compare with dataset:
-            prb = 0
-            for i in range(0, pred.shape[0]):
-                p_k1 = p_k2 = p_k3 = p_k4 = p_k5 = self.overflow
-                # ======================================= #
-                # PART 1: Fit on positive test
-                # ======================================= #
-                pa = self.s * self.t
-                #n = np.around(uncumul[i] * pa)
-                n = np.around(uncumul[i])
-                k = self.dataset[i][1]
-                p = 1 / self.binom_smoother
-                if k < 0 and n < 0:
-                    k *= -1
-                    n *= -1
-                if k > n:
-                    tmp = n
-                    n = k
-                    k = tmp
-                if k < 0:
-                    n += - k + 1
-                    k = 1
-                #n *= self.binom_smoother
-                prob = binom.pmf(k=k, n=n, p=p)
-                if prob > 0:
-                    p_k1 = np.log(binom.pmf(k=k, n=n, p=pa))
-                else:
-                    p_k1 = self.overflow
-
-                if p_k1 == - math.inf:
-                    p_k1 = - 1000
-                prb -= p_k1 * self.w_1
-
-                # ======================================= #
-                # PART 2: Fit on hospit
-                # ======================================= #
-                n = np.around(pred[i][4])
-                k = self.dataset[i][3]
-                p = 1 / self.binom_smoother
-                if k < 0 and n < 0:
-                    k *= -1
-                    n *= -1
-                if k > n:
-                    tmp = n
-                    n = k
-                    k = tmp
-                if k < 0:
-                    n += - k + 1
-                    k = 1
-                n *= self.binom_smoother
-                prob = binom.pmf(k=k, n=n, p=p)
-                if prob > 0:
-                    p_k2 = np.log(binom.pmf(k=k, n=n, p=p))
-                else:
-                    p_k2 = self.overflow
-                prb -= p_k2 * self.w_2
-
-                # ======================================= #
-                # PART 3: Fit on cumul hospit
-                # ======================================= #
-                n = np.around(pred[i][8])
-                k = self.dataset[i][4]
-                p = 1 / self.binom_smoother
-                if k < 0 and n < 0:
-                    k *= -1
-                    n *= -1
-                if k > n:
-                    tmp = n
-                    n = k
-                    k = tmp
-                if k < 0:
-                    n += - k + 1
-                    k = 1
-                n *= self.binom_smoother
-                prob = binom.pmf(k=k, n=n, p=p)
-                if prob > 0:
-                    p_k3 = np.log(binom.pmf(k=k, n=n, p=p))
-                else:
-                    p_k3 = self.overflow
-                prb -= p_k3 * self.w_3
-
-                # ======================================= #
-                # Part 4: Fit on Critical
-                # ======================================= #
-                n = np.around(pred[i][5])
-                k = self.dataset[i][5]
-                p = 1 / self.binom_smoother
-                if k < 0 and n < 0:
-                    k *= -1
-                    n *= -1
-                if k > n:
-                    tmp = n
-                    n = k
-                    k = tmp
-                if k < 0:
-                    n += - k + 1
-                    k = 1
-                n *= self.binom_smoother
-                prob = binom.pmf(k=k, n=n, p=p)
-                if prob > 0:
-                    p_k4 = np.log(binom.pmf(k=k, n=n, p=p))
-                else:
-                    p_k4 = self.overflow
-                prb -= p_k4 * self.w_4
-
-                # ======================================= #
-                # Part 5: Fit on Fatalities
-                # ======================================= #
-                n = np.around(pred[i][6])
-                k = self.dataset[i][6]
-                p = 1 / self.binom_smoother
-                if k < 0 and n < 0:
-                    k *= -1
-                    n *= -1
-                if k > n:
-                    tmp = n
-                    n = k
-                    k = tmp
-                if k < 0:
-                    n += - k + 1
-                    k = 1
-                n *= self.binom_smoother
-                prob = binom.pmf(k=k, n=n, p=p)
-                if prob > 0:
-                    p_k5 = np.log(binom.pmf(k=k, n=n, p=p))
-                else:
-                    p_k5 = self.overflow
-                prb -= p_k5 * self.w_5
-
-                if print_details:
-                    print('iter {}: {} - {} - {} - {} - {} - {}'.format(i, p_k1, p_k2, p_k3, p_k4, p_k5, p_k6))
-                    print('test+ cumul: {} - {}'.format(np.around(pred[i][7] * params[8] * params[9]), self.dataset[i][7]))
-                    print('hospit: {} - {}'.format(np.around(pred[i][4]), self.dataset[i][3]))
-                    print('hospit cumul: {} - {}'.format(np.around(pred[i][8]), self.dataset[i][4]))
-                    print('critical: {} - {}'.format(np.around(pred[i][5]), self.dataset[i][5]))
-                    print('Fatalities: {} - {}'.format(np.around(pred[i][6]), self.dataset[i][6]))
-
-            if display:
-                print(prb)
-            return prb
-
-        if method == 'method_2':
-            # Make predictions:
-            tpl = tuple(parameters)
+            pa = self.s * self.t
+        elif method == 'method_2':
+            tpl = parameters
             params = (tpl[0], tpl[1], tpl[2], tpl[3], self.hcr, self.pc, self.pd, self.pcr)
             init_state = self.get_initial_state(sensib=tpl[-2], test_rate=tpl[-1])
-            if display:
-                print(params)
-            pred = self.predict(duration=self.dataset.shape[0],
-                                parameters=params,
-                                initial_state=init_state)
-            # Uncumul positive test:
-            uncumul = []
-            uncumul.append(pred[0][7])
-            for i in range(1, pred.shape[0]):
-                uncumul.append(pred[i][7] - pred[i-1][7])
-            # Compare with dataset:
-            prb = 0
+            pa = tpl[-2] * tpl[-1]
+        else:
+            return None
+
+        # Binomial laws of each curve:
+        # PART 1: Fit on positive test
+        # PART 2: Fit on hospit
+        # PART 3: Fit on cumul hospit
+        # Part 4: Fit on Critical
+        # Part 5: Fit on Fatalities
+        if method == 'method_1':
+            scale_1 = 1.0
+            b_s_1 = 1
+            p_1 = pa
+        else:
+            scale_1 = pa
+            b_s_1 = self.binom_smoother
+            p_1 = 1 / self.binom_smoother
+        k = (self.ds_pos, self.ds_hosp, self.ds_cum_hosp, self.ds_crit, self.ds_death)
+        lgk = (self.gammaln_k['pos'], self.gammaln_k['hosp'], self.gammaln_k['cum_hosp'],
+               self.gammaln_k['crit'], self.gammaln_k['death'])
+        b_s = np.array([b_s_1, self.binom_smoother, self.binom_smoother, self.binom_smoother, self.binom_smoother],
+                       dtype=np.float64)
+        p = np.array([p_1, 1 / self.binom_smoother, 1 / self.binom_smoother, 1 / self.binom_smoother,
+                      1 / self.binom_smoother], dtype=np.float64)
+        weights = np.array([self.w_1, self.w_2, self.w_3, self.w_4, self.w_5], dtype=np.float64)
+
+        # One set of parameters with the RK4 integrator: everything is done by compiled code
+        if not batch and not print_details and self.integrator != 'LSODA':
+            if seir_fast is not None:
+                return seir_fast.objective(np.asarray(init_state, dtype=np.float64), self.dataset.shape[0],
+                                           np.asarray(params, dtype=np.float64), self.rk4_sub_steps,
+                                           scale_1, self.ds_obs, self.gammaln_obs, b_s, p, weights,
+                                           float(self.overflow))
+            return objective_jit(tuple(np.asarray(init_state, dtype=np.float64)), self.dataset.shape[0],
+                                 tuple(np.asarray(params, dtype=np.float64)), self.rk4_sub_steps,
+                                 scale_1, k, lgk, b_s, p, weights, float(self.overflow))
+
+        # One row of parameters and of initial state per column to evaluate:
+        if batch:
+            params = np.column_stack(np.broadcast_arrays(*params))
+            init_state = np.column_stack(np.broadcast_arrays(*init_state))
+
+        # Make predictions:
+        if print_details:
+            print(params)
+        pred = self.predict(duration=self.dataset.shape[0],
+                            parameters=params,
+                            initial_state=init_state)
+        # Uncumul positive test:
+        uncumul = np.diff(pred[..., 7], axis=0, prepend=0)
+        # Predicted curves to compare:
+        pred_H = pred[..., 4]
+        pred_C = pred[..., 5]
+        pred_D = pred[..., 6]
+        pred_CH = pred[..., 8]
+        # Rounded predictions, one column per set of parameters:
+        n = (np.around(uncumul * scale_1), np.around(pred_H), np.around(pred_CH), np.around(pred_C), np.around(pred_D))
+        if not batch:
+            n = tuple(np.reshape(x, (-1, 1)) for x in n)
+
+        prb = - _loglike_all(n, k, lgk, b_s, p, weights, float(self.overflow))
+        if not batch:
+            prb = prb[0]
+
+        if print_details:
+            p_k1, p_k2, p_k3, p_k4, p_k5 = (self.log_likelihood(k=k[j], lgk=lgk[j], n=n[j][:, 0], b_s=b_s[j], p=p[j])
+                                            for j in range(5))
             for i in range(0, pred.shape[0]):
-                p_k1 = p_k2 = p_k3 = p_k4 = p_k5 = self.overflow
-                # ======================================= #
-                # PART 1: Fit on positive test
-                # ======================================= #
-                pa = tpl[-2] * tpl[-1]
-                n = np.around(uncumul[i] * pa)
-                k = self.dataset[i][1]
-                p = 1 / self.binom_smoother
-                if k < 0 and n < 0:
-                    k *= -1
-                    n *= -1
-                if k > n:
-                    tmp = n
-                    n = k
-                    k = tmp
-                if k < 0:
-                    n += - k + 1
-                    k = 1
-                n *= self.binom_smoother
-                prob = binom.pmf(k=k, n=n, p=p)
-                if prob > 0:
-                    p_k1 = np.log(binom.pmf(k=k, n=n, p=p))
-                else:
-                    p_k1 = self.overflow
-                prb -= p_k1 * self.w_1
-
-                # ======================================= #
-                # PART 2: Fit on hospit
-                # ======================================= #
-                n = np.around(pred[i][4])
-                k = self.dataset[i][3]
-                p = 1 / self.binom_smoother
-                if k < 0 and n < 0:
-                    k *= -1
-                    n *= -1
-                if k > n:
-                    tmp = n
-                    n = k
-                    k = tmp
-                if k < 0:
-                    n += - k + 1
-                    k = 1
-                n *= self.binom_smoother
-                prob = binom.pmf(k=k, n=n, p=p)
-                if prob > 0:
-                    p_k2 = np.log(binom.pmf(k=k, n=n, p=p))
-                else:
-                    p_k2 = self.overflow
-                prb -= p_k2 * self.w_2
-
-                # ======================================= #
-                # PART 3: Fit on cumul hospit
-                # ======================================= #
-                n = np.around(pred[i][8])
-                k = self.dataset[i][4]
-                p = 1 / self.binom_smoother
-                if k < 0 and n < 0:
-                    k *= -1
-                    n *= -1
-                if k > n:
-                    tmp = n
-                    n = k
-                    k = tmp
-                if k < 0:
-                    n += - k + 1
-                    k = 1
-                n *= self.binom_smoother
-                prob = binom.pmf(k=k, n=n, p=p)
-                if prob > 0:
-                    p_k3 = np.log(binom.pmf(k=k, n=n, p=p))
-                else:
-                    p_k3 = self.overflow
-                prb -= p_k3 * self.w_3
-
-                # ======================================= #
-                # Part 4: Fit on Critical
-                # ======================================= #
-                n = np.around(pred[i][5])
-                k = self.dataset[i][5]
-                p = 1 / self.binom_smoother
-                if k < 0 and n < 0:
-                    k *= -1
-                    n *= -1
-                if k > n:
-                    tmp = n
-                    n = k
-                    k = tmp
-                if k < 0:
-                    n += - k + 1
-                    k = 1
-                n *= self.binom_smoother
-                prob = binom.pmf(k=k, n=n, p=p)
-                if prob > 0:
-                    p_k4 = np.log(binom.pmf(k=k, n=n, p=p))
-                else:
-                    p_k4 = self.overflow
-                prb -= p_k4 * self.w_4
-
-                # ======================================= #
-                # Part 5: Fit on Fatalities
-                # ======================================= #
-                n = np.around(pred[i][6])
-                k = self.dataset[i][6]
-                p = 1 / self.binom_smoother
-                if k < 0 and n < 0:
-                    k *= -1
-                    n *= -1
-                if k > n:
-                    tmp = n
-                    n = k
-                    k = tmp
-                if k < 0:
-                    n += - k + 1
-                    k = 1
-                n *= self.binom_smoother
-                prob = binom.pmf(k=k, n=n, p=p)
-                if prob > 0:
-                    p_k5 = np.log(binom.pmf(k=k, n=n, p=p))
-                else:
-                    p_k5 = self.overflow
-                prb -= p_k5 * self.w_5
-
-                if print_details:
-                    print('iter {}: {} - {} - {} - {} - {} - {}'.format(i, p_k1, p_k2, p_k3, p_k4, p_k5, p_k6))
-                    print('test+ cumul: {} - {}'.format(np.around(pred[i][7] * params[8] * params[9]), self.dataset[i][7]))
-                    print('hospit: {} - {}'.format(np.around(pred[i][4]), self.dataset[i][3]))
-                    print('hospit cumul: {} - {}'.format(np.around(pred[i][8]), self.dataset[i][4]))
-                    print('critical: {} - {}'.format(np.around(pred[i][5]), self.dataset[i][5]))
-                    print('Fatalities: {} - {}'.format(np.around(pred[i][6]), self.dataset[i][6]))
+                print('iter {}: {} - {} - {} - {} - {}'.format(i, p_k1[i], p_k2[i], p_k3[i], p_k4[i], p_k5[i]))
+                print('test+ cumul: {} - {}'.format(np.around(pred[i][7] * pa), self.ds_cum_pos[i]))
+                print('hospit: {} - {}'.format(np.around(pred_H[i]), self.ds_hosp[i]))
+                print('hospit cumul: {} - {}'.format(np.around(pred_CH[i]), self.ds_cum_hosp[i]))
+                print('critical: {} - {}'.format(np.around(pred_C[i]), self.ds_crit[i]))
+                print('Fatalities: {} - {}'.format(np.around(pred_D[i]), self.ds_death[i]))
 
-            if display:
-                print(prb)
-            return prb
+        if print_details:
+            print(prb)
+        return prb
 
 
     def score(self, output='raw'):
@@ -671,111 +789,31 @@ class SEIR():
                             parameters=params,
                             initial_state=init_state)
         # Uncumul positive test:
-        uncumul = []
-        uncumul.append(pred[0][7])
-        for i in range(1, pred.shape[0]):
-            uncumul.append(pred[i][7] - pred[i - 1][7])
+        uncumul = np.diff(pred[:, 7], prepend=0)
+        # Predicted curves to compare:
+        pred_H = pred[:, 4]
+        pred_C = pred[:, 5]
+        pred_D = pred[:, 6]
+        pred_CH = pred[:, 8]
         # Store raw result:
         raw = np.zeros((pred.shape[0], 4))
-        # Compare with dataset:
-        for i in range(0, pred.shape[0]):
-            p_k1 = p_k2 = p_k3 = p_k4 = self.overflow
-
-            # ======================================= #
-            # PART 1: Compare positives
-            # ======================================= #
-            n = np.around(uncumul[i] * self.s * self.t)
-            k = self.dataset[i][1]
-            p = 1 / self.b_s_score
-            if k < 0 and n < 0:
-                k *= -1
-                n *= -1
-            if k > n:
-                tmp = n
-                n = k
-                k = tmp
-            if k < 0:
-                n += - k + 1
-                k = 1
-            n *= self.b_s_score
-            prob = binom.pmf(k=k, n=n, p=p)
-            if prob > 0:
-                p_k1 = np.log(binom.pmf(k=k, n=n, p=p))
-            else:
-                p_k1 = self.overflow
-            raw[i][0] = p_k1
-
-            # ======================================= #
-            # PART 2: Compare on Hospit cumul
-            # ======================================= #
-            n = np.around(pred[i][8])
-            k = self.dataset[i][4]
-            p = 1 / self.b_s_score
-            if k < 0 and n < 0:
-                k *= -1
-                n *= -1
-            if k > n:
-                tmp = n
-                n = k
-                k = tmp
-            if k < 0:
-                n += - k + 1
-                k = 1
-            n *= self.b_s_score
-            prob = binom.pmf(k=k, n=n, p=p)
-            if prob > 0:
-                p_k2 = np.log(binom.pmf(k=k, n=n, p=p))
-            else:
-                p_k2 = self.overflow
-            raw[i][1] = p_k2
-
-            # ======================================= #
-            # Part 3: Compare criticals
-            # ======================================= #
-            n = np.around(pred[i][5])
-            k = self.dataset[i][5]
-            p = 1 / self.b_s_score
-            if k < 0 and n < 0:
-                k *= -1
-                n *= -1
-            if k > n:
-                tmp = n
-                n = k
-                k = tmp
-            if k < 0:
-                n += - k + 1
-                k = 1
-            n *= self.b_s_score
-            prob = binom.pmf(k=k, n=n, p=p)
-            if prob > 0:
-                p_k3 = np.log(binom.pmf(k=k, n=n, p=p))
-            else:
-                p_k3 = self.overflow
-            raw[i][2] = p_k3
-
-            # ======================================= #
-            # Part 4: Compare fatalities
-            # ======================================= #
-            n = np.around(pred[i][6])
-            k = self.dataset[i][6]
-            p = 1 / self.b_s_score
-            if k < 0 and n < 0:
-                k *= -1
-                n *= -1
-            if k > n:
-                tmp = n
-                n = k
-                k = tmp
-            if k < 0:
-                n += - k + 1
-                k = 1
-            n *= self.b_s_score
-            prob = binom.pmf(k=k, n=n, p=p)
-            if prob > 0:
-                p_k4 = np.log(binom.pmf(k=k, n=n, p=p))
-            else:
-                p_k4 = self.overflow
-            raw[i][3] = p_k4
+
+        # ======================================= #
+        # PART 1: Compare positives
+        # ======================================= #
+        raw[:, 0] = self.log_likelihood(k=self.ds_pos, lgk=self.gammaln_k['pos'], n=np.around(uncumul * self.s * self.t), b_s=self.b_s_score)
+        # ======================================= #
+        # PART 2: Compare on Hospit cumul
+        # ======================================= #
+        raw[:, 1] = self.log_likelihood(k=self.ds_cum_hosp, lgk=self.gammaln_k['cum_hosp'], n=np.around(pred_CH), b_s=self.b_s_score)
+        # ======================================= #
+        # Part 3: Compare criticals
+        # ======================================= #
+        raw[:, 2] = self.log_likelihood(k=self.ds_crit, lgk=self.gammaln_k['crit'], n=np.around(pred_C), b_s=self.b_s_score)
+        # ======================================= #
+        # Part 4: Compare fatalities
+        # ======================================= #
+        raw[:, 3] = self.log_likelihood(k=self.ds_death, lgk=self.gammaln_k['death'], n=np.around(pred_D), b_s=self.b_s_score)
 
         if output == 'raw':
             return raw
@@ -792,16 +830,30 @@ class SEIR():
         raw = pd.read_csv(url, sep=',', header=0)
         raw['num_positive'][0] = 1
         # Ad a new column at the end with cumulative positive cases at the right
-        cumul_positive = np.copy(raw['num_positive'].to_numpy())
-        for i in range(1, len(cumul_positive)):
-            cumul_positive[i] += cumul_positive[i-1]
+        cumul_positive = np.cumsum(raw['num_positive'].to_numpy())
         raw.insert(7, 'cumul_positive', cumul_positive)
         if self.smoothing:
             self.dataframe = dataframe_smoothing(raw)
         else: self.dataframe = raw
         self.dataset = self.dataframe.to_numpy()
-
-        self.I_0 = self.dataset[0][1] / (self.s * self.t)
+        self.init_cache = None
+        # One contiguous array per observed curve:
+        self.ds_pos = np.ascontiguousarray(self.dataset[:, 1], dtype=np.float64)
+        self.ds_hosp = np.ascontiguousarray(self.dataset[:, 3], dtype=np.float64)
+        self.ds_cum_hosp = np.ascontiguousarray(self.dataset[:, 4], dtype=np.float64)
+        self.ds_crit = np.ascontiguousarray(self.dataset[:, 5], dtype=np.float64)
+        self.ds_death = np.ascontiguousarray(self.dataset[:, 6], dtype=np.float64)
+        self.ds_cum_pos = np.ascontiguousarray(self.dataset[:, 7], dtype=np.float64)
+        # gammaln(k + 1) of the observed values, used by log_likelihood
+        self.gammaln_k = {'pos': gammaln(self.ds_pos + 1),
+                          'hosp': gammaln(self.ds_hosp + 1),
+                          'cum_hosp': gammaln(self.ds_cum_hosp + 1),
+                          'crit': gammaln(self.ds_crit + 1),
+                          'death': gammaln(self.ds_death + 1)}
+        self.ds_obs = np.stack((self.ds_pos, self.ds_hosp, self.ds_cum_hosp, self.ds_crit, self.ds_death))
+        self.gammaln_obs = gammaln(self.ds_obs + 1)
+
+        self.I_0 = self.ds_pos[0] / (self.s * self.t)
         self.E_0 = self.I_0 * 5
         self.R_0 = 0
         self.S_0 = 1000000 - self.I_0 - self.E_0
@@ -850,6 +902,8 @@ class SEIR():
 
 
 def valid_result_analysis():
+    # Only needed for the plots, not imported with the model
+    import matplotlib.pyplot as plt
 
     # Import validation result:
     result = pd.read_csv('validation_result.csv', sep=';')
@@ -887,16 +941,12 @@ def valid_result_analysis():
         # Make predictions:
         predictions = model.predict(duration=model.dataset.shape[0])
         # Uncumul
-        uncumul = []
-        uncumul.append(predictions[0][7])
-        for j in range(1, predictions.shape[0]):
-            uncumul.append(predictions[j][7] - predictions[j - 1][7])
+        uncumul = np.diff(predictions[:, 7], prepend=0)
 
         # Plot:
         time = model.dataset[:, 0]
         # Adapt test + with sensit and testing rate
-        for j in range(0, len(time)):
-            uncumul[j] = uncumul[j] * model.s * model.t
+        uncumul = uncumul * model.s * model.t
 
         # Plot cumul positive
         plt.scatter(time, model.dataset[:, 1], c='blue', label='test+')
@@ -932,6 +982,7 @@ def valid_result_analysis():
 
 
 def first():
+    import matplotlib.pyplot as plt
 
     # Create the model:
     model = SEIR()
@@ -955,13 +1006,9 @@ def first():
     prd = model.predict(model.dataset.shape[0], parameters=params)
 
     # Uncumul:
-    uncumul = []
-    uncumul.append(prd[0][7])
-    for i in range(1, prd.shape[0]):
-        uncumul.append(prd[i][7] - prd[i-1][7])
+    uncumul = np.diff(prd[:, 7], prepend=0)
 
-    for i in range(0, prd.shape[0]):
-        uncumul[i] = uncumul[i] * model.s * model.t
+    uncumul = uncumul * model.s * model.t
     print('=== For positif: ')
     for i in range(0, 10):
         print('dataset: {}, predict = {}'.format(model.dataset[i, 1], uncumul[i]))
@@ -987,6 +1034,7 @@ def first():
     plt.show()
 
 def sec():
+    import matplotlib.pyplot as plt
 
     # Create the model:
     model = SEIR()
@@ -1009,16 +1057,12 @@ def sec():
     print(model.get_parameters())
 
     # Uncumul
-    uncumul = []
-    uncumul.append(predictions[0][7])
-    for j in range(1, predictions.shape[0]):
-        uncumul.append(predictions[j][7] - predictions[j - 1][7])
+    uncumul = np.diff(predictions[:, 7], prepend=0)
 
     # Plot:
     time = model.dataset[:, 0]
     # Adapt test + with sensit and testing rate
-    for j in range(0, len(time)):
-        uncumul[j] = uncumul[j] * model.s * model.t
+    uncumul = uncumul * model.s * model.t
 
     # Plot cumul positive
     plt.scatter(time, model.dataset[:, 1], c='blue', label='test+')
@@ -0,0 +1,58 @@
+"""
+Ahead of time compilation of the RK4 integrators and the objective function.
+Run with: python build_seir.py, again after each modification of SEIR.py
+It writes the seir_fast extension module next to SEIR.py. When it is present and built from the
+current SEIR.py, SEIR.py use it instead of the numba JIT versions, so new processes
+(model_select --jobs) don't compile anything.
+"""
+import os
+from numba.pycc import CC
+
+from SEIR import integrate_seir, integrate_seir_batch, objective_jit, source_hash
+
+cc = CC('seir_fast')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+# Hash of SEIR.py at build time, checked by SEIR.py when importing seir_fast
+SOURCE_HASH = source_hash()
+
+
+@cc.export('source_hash', 'i8()')
+def exported_source_hash():
+    """
+    See SEIR.source_hash
+    """
+    return SOURCE_HASH
+
+
+@cc.export('integrate', 'f8[:, :](f8[:], i8, f8, f8[:], i8)')
+def integrate(y0, n_steps, dt, prm, n_sub):
+    """
+    See SEIR.integrate_seir, with arrays instead of tuples
+    """
+    return integrate_seir((y0[0], y0[1], y0[2], y0[3], y0[4], y0[5], y0[6], y0[7], y0[8]), n_steps, dt,
+                          (prm[0], prm[1], prm[2], prm[3], prm[4], prm[5], prm[6], prm[7]), n_sub)
+
+
+@cc.export('integrate_batch', 'f8[:, :, :](f8[:, :], i8, f8, f8[:, :], i8)')
+def integrate_batch(y0, n_steps, dt, prm, n_sub):
+    """
+    See SEIR.integrate_seir_batch
+    """
+    return integrate_seir_batch(y0, n_steps, dt, prm, n_sub)
+
+
+@cc.export('objective', 'f8(f8[:], i8, f8[:], i8, f8, f8[:, :], f8[:, :], f8[:], f8[:], f8[:], f8)')
+def objective(y0, n_steps, prm, n_sub, scale_1, k, lgk, b_s, p, weights, overflow):
+    """
+    See SEIR.objective_jit, with arrays instead of tuples: one row of k and lgk per observed curve
+    """
+    return objective_jit((y0[0], y0[1], y0[2], y0[3], y0[4], y0[5], y0[6], y0[7], y0[8]), n_steps,
+                         (prm[0], prm[1], prm[2], prm[3], prm[4], prm[5], prm[6], prm[7]), n_sub,
+                         scale_1, k, lgk, b_s, p, weights, overflow)
+
+
+if __name__ == "__main__":
+
+    cc.compile()
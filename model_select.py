@@ -1,7 +1,7 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import SEIR
 import argparse
+import multiprocessing
 
 
 class model_selection():
@@ -37,12 +37,12 @@ class model_selection():
         self.model.import_dataset()
         self.model.fit_type = 'type_1'
 
-    def perform(self, select_part=1, optimizer='LBFGSB'):
-
-        iter = 0
-        total_iter = len(self.w_1) ** 4 * len(self.binom_smoother)
-        if optimizer=='LBFGSB':
-            total_iter *= len(self.step_size)
+    def perform(self, select_part=1, optimizer='LBFGSB', jobs=1):
+        """
+        Fit the model for each combination of hyper-parameters and write the results
+        in a csv file. Each fit is independent from the others.
+        :param jobs: Number of processes used to perform the fits (-1 = all cores)
+        """
 
         self.model.optimizer = optimizer
         if select_part == 1:
@@ -50,189 +50,134 @@ class model_selection():
         else:
             self.model.w_1 = self.w_1[1]
 
+        # Step size is only used by LBFGSB
+        step_sizes = [self.model.opti_step]
+        if optimizer == 'LBFGSB':
+            step_sizes = self.step_size
+
+        # List of all the combinations to test:
+        tasks = []
         for w_2 in self.w_2:
-            self.model.w_2 = w_2
             for w_3 in self.w_3:
-                self.model.w_3 = w_3
                 for w_4 in self.w_4:
-                    self.model.w_4 = w_4
                     for w_5 in self.w_5:
-                        self.model.w_5 = w_5
                         for binom_smoother in self.binom_smoother:
-                            self.model.binom_smoother = binom_smoother
-
-                            if self.model.optimizer == 'LBFGSB':
-                                for step_size in self.step_size:
-                                    self.model.opti_step = step_size
-
-                                    iter += 1
-                                    print('iter {} / {}'.format(iter, total_iter))
-
-                                    # Reinit the model
-                                    self.model.beta = 0.3  # Contamination rate
-                                    self.model.sigma = 0.8  # Incubation rate
-                                    self.model.gamma = 0.15  # Recovery rate
-                                    self.model.hp = 0.05  # Hospit rate
-                                    self.model.hcr = 0.2  # Hospit recovery rate
-                                    self.model.pc = 0.1  # Critical rate
-                                    self.model.pd = 0.1  # Critical recovery rate
-                                    self.model.pcr = 0.3  # Critical mortality
-                                    self.model.s = 0.765  # Sensitivity
-                                    self.model.t = 0.75  # Testing rate in symptomatical
-
-                                    # Fit the model:
-                                    self.model.fit()
-
-                                    # Get SEIR parameters value:
-                                    param_seir = self.model.get_parameters()
-
-                                    # Get model's Hyper parameters
-                                    h_param = self.model.get_hyper_parameters()
-
-                                    # Get score:
-                                    raw = self.model.score(output='raw')
-                                    mean_test = str(np.mean(raw[:, 0]))
-                                    sum_test = str(np.sum(raw[:, 0]))
-                                    std_test = str(np.std(raw[:, 0]))
-                                    mean_hospit = str(np.mean(raw[:, 1]))
-                                    sum_hospit = str(np.sum(raw[:, 1]))
-                                    std_hospit = str(np.std(raw[:, 1]))
-                                    mean_critical = str(np.mean(raw[:, 2]))
-                                    sum_critical = str(np.sum(raw[:, 2]))
-                                    std_critical = str(np.std(raw[:, 2]))
-                                    mean_fata = str(np.mean(raw[:, 3]))
-                                    sum_fata = str(np.sum(raw[:, 3]))
-                                    std_fata = str(np.std(raw[:, 3]))
-                                    mean_tot = str(np.mean(raw))
-                                    sum_tot = str(np.sum(raw))
-                                    std_tot = str(np.std(raw))
-
-                                    # Write in file:
-                                    # Make a list of informations:
-                                    str_lst = []
-                                    str_lst.append(sum_tot)
-                                    for item in param_seir:
-                                        str_lst.append(item)
-                                    for item in h_param:
-                                        str_lst.append(item)
-                                    str_lst.append(mean_tot)
-                                    str_lst.append(sum_tot)
-                                    str_lst.append(std_tot)
-                                    str_lst.append(mean_test)
-                                    str_lst.append(sum_test)
-                                    str_lst.append(std_test)
-                                    str_lst.append(mean_hospit)
-                                    str_lst.append(sum_hospit)
-                                    str_lst.append(std_hospit)
-                                    str_lst.append(mean_critical)
-                                    str_lst.append(sum_critical)
-                                    str_lst.append(std_critical)
-                                    str_lst.append(mean_fata)
-                                    str_lst.append(sum_fata)
-                                    str_lst.append(std_fata)
-
-                                    convert_str_lst = []
-                                    for i in range(0, len(str_lst)):
-                                        convert_str_lst.append(str(str_lst[i]))
-
-                                    print(convert_str_lst)
-
-                                    final_str = ';'.join(convert_str_lst)
-
-                                    file = open(
-                                        'mod_select_result_part{}-{}-{}.csv'.format(select_part, self.smoothing, self.model.optimizer), "a")
-                                    file.write(final_str)
-                                    file.write('\n')
-
-                                    file.close()
-
-                            else:
-
-                                iter += 1
-                                print('iter {} / {}'.format(iter, total_iter))
-
-                                # Reinit the model
-                                self.model.beta = 0.3  # Contamination rate
-                                self.model.sigma = 0.8  # Incubation rate
-                                self.model.gamma = 0.15  # Recovery rate
-                                self.model.hp = 0.05  # Hospit rate
-                                self.model.hcr = 0.2  # Hospit recovery rate
-                                self.model.pc = 0.1  # Critical rate
-                                self.model.pd = 0.1  # Critical recovery rate
-                                self.model.pcr = 0.3  # Critical mortality
-                                self.model.s = 0.765  # Sensitivity
-                                self.model.t = 0.75  # Testing rate in symptomatical
-
-                                # Fit the model:
-                                self.model.fit()
-
-                                # Get SEIR parameters value:
-                                param_seir = self.model.get_parameters()
-
-                                # Get model's Hyper parameters
-                                h_param = self.model.get_hyper_parameters()
-
-                                # Get score:
-                                raw = self.model.score(output='raw')
-                                mean_test = str(np.mean(raw[:, 0]))
-                                sum_test = str(np.sum(raw[:, 0]))
-                                std_test = str(np.std(raw[:, 0]))
-                                mean_hospit = str(np.mean(raw[:, 1]))
-                                sum_hospit = str(np.sum(raw[:, 1]))
-                                std_hospit = str(np.std(raw[:, 1]))
-                                mean_critical = str(np.mean(raw[:, 2]))
-                                sum_critical = str(np.sum(raw[:, 2]))
-                                std_critical = str(np.std(raw[:, 2]))
-                                mean_fata = str(np.mean(raw[:, 3]))
-                                sum_fata = str(np.sum(raw[:, 3]))
-                                std_fata = str(np.std(raw[:, 3]))
-                                mean_tot = str(np.mean(raw))
-                                sum_tot = str(np.sum(raw))
-                                std_tot = str(np.std(raw))
-
-                                # Write in file:
-                                # Make a list of informations:
-                                str_lst = []
-                                str_lst.append(sum_tot)
-                                for item in param_seir:
-                                    str_lst.append(item)
-                                for item in h_param:
-                                    str_lst.append(item)
-                                str_lst.append(mean_tot)
-                                str_lst.append(sum_tot)
-                                str_lst.append(std_tot)
-                                str_lst.append(mean_test)
-                                str_lst.append(sum_test)
-                                str_lst.append(std_test)
-                                str_lst.append(mean_hospit)
-                                str_lst.append(sum_hospit)
-                                str_lst.append(std_hospit)
-                                str_lst.append(mean_critical)
-                                str_lst.append(sum_critical)
-                                str_lst.append(std_critical)
-                                str_lst.append(mean_fata)
-                                str_lst.append(sum_fata)
-                                str_lst.append(std_fata)
-
-                                convert_str_lst = []
-                                for i in range(0, len(str_lst)):
-                                    convert_str_lst.append(str(str_lst[i]))
-
-                                print(convert_str_lst)
-
-                                final_str = ';'.join(convert_str_lst)
-                                file = open(
-                                        'mod_select_result_part{}-{}-{}.csv'.format(select_part, self.smoothing, self.model.optimizer), "a")
-
-                                file.write(final_str)
-                                file.write('\n')
-
-                                file.close()
-
-
-
-
+                            for step_size in step_sizes:
+                                tasks.append((self.model, w_2, w_3, w_4, w_5, binom_smoother, step_size))
+        total_iter = len(tasks)
+
+        if jobs == -1:
+            jobs = multiprocessing.cpu_count()
+        pool = None
+        if jobs > 1:
+            # Processes and not threads: each worker get its own copy of the model
+            pool = multiprocessing.Pool(processes=jobs)
+            results = pool.imap(fit_one_star, tasks)
+        else:
+            results = map(fit_one_star, tasks)
 
+        iter = 0
+        for final_str in results:
+            iter += 1
+            print('iter {} / {}'.format(iter, total_iter))
+            print(final_str)
+
+            file = open(
+                'mod_select_result_part{}-{}-{}.csv'.format(select_part, self.smoothing, self.model.optimizer), "a")
+            file.write(final_str)
+            file.write('\n')
+
+            file.close()
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def fit_one(model, w_2, w_3, w_4, w_5, binom_smoother, step_size):
+    """
+    Fit the model for one combination of hyper-parameters
+    :return: The line to write in the result file
+    """
+    model.w_2 = w_2
+    model.w_3 = w_3
+    model.w_4 = w_4
+    model.w_5 = w_5
+    model.binom_smoother = binom_smoother
+    model.opti_step = step_size
+
+    # Reinit the model
+    model.beta = 0.3  # Contamination rate
+    model.sigma = 0.8  # Incubation rate
+    model.gamma = 0.15  # Recovery rate
+    model.hp = 0.05  # Hospit rate
+    model.hcr = 0.2  # Hospit recovery rate
+    model.pc = 0.1  # Critical rate
+    model.pd = 0.1  # Critical recovery rate
+    model.pcr = 0.3  # Critical mortality
+    model.s = 0.765  # Sensitivity
+    model.t = 0.75  # Testing rate in symptomatical
+
+    # Fit the model:
+    model.fit()
+
+    # Get SEIR parameters value:
+    param_seir = model.get_parameters()
+
+    # Get model's Hyper parameters
+    h_param = model.get_hyper_parameters()
+
+    # Get score:
+    raw = model.score(output='raw')
+    mean_test = str(np.mean(raw[:, 0]))
+    sum_test = str(np.sum(raw[:, 0]))
+    std_test = str(np.std(raw[:, 0]))
+    mean_hospit = str(np.mean(raw[:, 1]))
+    sum_hospit = str(np.sum(raw[:, 1]))
+    std_hospit = str(np.std(raw[:, 1]))
+    mean_critical = str(np.mean(raw[:, 2]))
+    sum_critical = str(np.sum(raw[:, 2]))
+    std_critical = str(np.std(raw[:, 2]))
+    mean_fata = str(np.mean(raw[:, 3]))
+    sum_fata = str(np.sum(raw[:, 3]))
+    std_fata = str(np.std(raw[:, 3]))
+    mean_tot = str(np.mean(raw))
+    sum_tot = str(np.sum(raw))
+    std_tot = str(np.std(raw))
+
+    # Write in file:
+    # Make a list of informations:
+    str_lst = []
+    str_lst.append(sum_tot)
+    for item in param_seir:
+        str_lst.append(item)
+    for item in h_param:
+        str_lst.append(item)
+    str_lst.append(mean_tot)
+    str_lst.append(sum_tot)
+    str_lst.append(std_tot)
+    str_lst.append(mean_test)
+    str_lst.append(sum_test)
+    str_lst.append(std_test)
+    str_lst.append(mean_hospit)
+    str_lst.append(sum_hospit)
+    str_lst.append(std_hospit)
+    str_lst.append(mean_critical)
+    str_lst.append(sum_critical)
+    str_lst.append(std_critical)
+    str_lst.append(mean_fata)
+    str_lst.append(sum_fata)
+    str_lst.append(std_fata)
+
+    convert_str_lst = []
+    for i in range(0, len(str_lst)):
+        convert_str_lst.append(str(str_lst[i]))
+
+    return ';'.join(convert_str_lst)
+
+
+def fit_one_star(args):
+    return fit_one(*args)
 
 
 if __name__ == "__main__":
@@ -244,7 +189,9 @@ if __name__ == "__main__":
     # Parties 1 à 4
     parser.add_argument('--part', default=1)
     # otptimizer
-    parser.add_argument('--opti', default='LBFGSB')
+    parser.add_argument('--opti', default='LBFGSB', choices=['COBYLA', 'COBYQA', 'LBFGSB', 'DE', 'Auto'])
+    # Number of parallel fits (-1 = all cores)
+    parser.add_argument('--jobs', default=1)
 
     args = parser.parse_args()
 
@@ -260,4 +207,4 @@ if __name__ == "__main__":
         selected = 2
 
 
-    selector.perform(select_part=selected, optimizer=args.opti)
+    selector.perform(select_part=selected, optimizer=args.opti, jobs=int(args.jobs))
@@ -0,0 +1,23 @@
+import numpy as np
+
+from SEIR import SEIR
+
+
+def predict_population(integrator):
+    """
+    Size of the population S + E + I + R + H + C + D at each day of a prediction
+    """
+    model = SEIR()
+    model.set_param()
+    model.integrator = integrator
+    init = (1000000 - 6, 5, 1, 0, 0, 0, 0, 1, 0)
+    pred = model.predict(duration=200, initial_state=init)
+    return pred[:, :7].sum(axis=1)
+
+
+def test_population_is_conserved_rk4():
+    np.testing.assert_allclose(predict_population('RK4'), 1e6, rtol=1e-9)
+
+
+def test_population_is_conserved_lsoda():
+    np.testing.assert_allclose(predict_population('LSODA'), 1e6, rtol=1e-6)